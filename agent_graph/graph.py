@@ -7,17 +7,23 @@ from agents.sql_agents import (
 from decouple import config
 from states.agent_state import AgentGraphState, get_agent_graph_state
 from db.mongo_connection import get_checkpointer
+from utils.deadline import Deadline
+from utils.helper_functions import serialize_event
 
 checkpointer = get_checkpointer()
 
 def create_graph(temperature=0):
     graph = StateGraph(AgentGraphState)
+    # Nodes take `config` to read the request deadline, which shadows decouple's `config` inside them
+    query_model = config("QUERY_MODEL", "gemini-1.5-pro-002")
 
     graph.add_node(
         "query_converter", 
-        lambda state: SQLQueryAgent(
+        lambda state, config: SQLQueryAgent(
             state=state,
-            model=config("QUERY_MODEL", "gemini-1.5-pro-002"),
+            model=query_model,
+            deadline=Deadline.from_config(config),
+            stage="query_converter",
         ).invoke(
             user_query=state["user_query"]
         )
@@ -25,9 +31,11 @@ def create_graph(temperature=0):
 
     graph.add_node(
         "sql_executor", 
-        lambda state: SQLExecutorAgent(
+        lambda state, config: SQLExecutorAgent(
             state=state,
-            model=config("QUERY_MODEL", "gemini-1.5-pro-002"),
+            model=query_model,
+            deadline=Deadline.from_config(config),
+            stage="sql_executor",
         ).invoke(
             sql_query=get_agent_graph_state(state=state, state_key="sql_query")
         )
@@ -35,9 +43,11 @@ def create_graph(temperature=0):
 
     graph.add_node(
         "response_formatter", 
-        lambda state: ResponseFormatterAgent(
+        lambda state, config: ResponseFormatterAgent(
             state=state,
-            model=config("QUERY_MODEL", "gemini-1.5-pro-002"),
+            model=query_model,
+            deadline=Deadline.from_config(config),
+            stage="response_formatter",
         ).invoke(
             sql_result=get_agent_graph_state(state=state, state_key="sql_result")
         )
@@ -57,3 +67,21 @@ def create_graph(temperature=0):
 def compile_workflow(graph):
     workflow = graph.compile(checkpointer=checkpointer)
     return workflow
+
+def run_workflow(workflow, user_query, thread_id, deadline, recursion_limit):
+    """
+    Streams the workflow for one question and returns the serialized `end_node` event,
+    or None if the graph finished without reaching it. `deadline` is an epoch timestamp.
+    """
+    limit = {
+        "recursion_limit": recursion_limit,
+        "configurable": {
+            "thread_id": str(thread_id),
+            "checkpoint_ns": "youtube-summary",
+            "deadline": deadline
+        }
+    }
+    for event in workflow.stream({"user_query": user_query}, limit):
+        if "end_node" in event:
+            return serialize_event(event)  # ✅ Stop after processing the first valid event
+    return None
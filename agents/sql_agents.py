@@ -1,14 +1,23 @@
 import json
+import contextvars
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 from states.agent_state import AgentGraphState
 from models.gemini_models import GeminiModel
 from tools.snowflake_tools import execute_snowflake_query
+from utils.deadline import DeadlineExceeded
+
+# How often an in-flight LLM call is checked against the request deadline
+LLM_POLL_INTERVAL = 0.25
 
 class Agent:
-    def __init__(self, state: AgentGraphState, model=None, server="gemini", temperature=0):
+    def __init__(self, state: AgentGraphState, model=None, server="gemini", temperature=0, deadline=None, stage=None):
         self.state = state
         self.model = model
         self.server = server
         self.temperature = temperature
+        self.deadline = deadline
+        self.stage = stage
 
     def get_llm(self, json_output=True):
         if self.server == 'gemini':
@@ -19,7 +28,44 @@ class Agent:
             )
         else:
             return {"error": "Missing or wrong 'server' in request body."}
-    
+
+    def check_deadline(self):
+        if self.deadline:
+            self.deadline.check(self.stage)
+
+    def call_llm(self, prompt, json_output=True):
+        """
+        Invokes the LLM within the request deadline. The model is built and called on a
+        helper thread, so the node gives up as soon as the deadline passes or the client
+        disconnects, even during the OAuth token refresh or while the HTTP call is in
+        flight; the helper then stops at its next response chunk.
+        """
+        self.check_deadline()
+        if not self.deadline:
+            return self.get_llm(json_output=json_output).invoke(prompt)
+
+        def should_abort():
+            return self.deadline.expired() or self.deadline.cancelled()
+
+        def invoke_llm():
+            llm = self.get_llm(json_output=json_output)
+            # urllib3 rejects a zero timeout, so keep a tiny floor for the last instant of the budget
+            timeout = max(self.deadline.remaining(), 0.001)
+            return llm.invoke(prompt, timeout=timeout, should_abort=should_abort)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        # ✅ copy_context keeps trace recording attached to this request
+        future = executor.submit(contextvars.copy_context().run, invoke_llm)
+        executor.shutdown(wait=False)
+        while not wait([future], timeout=LLM_POLL_INTERVAL).done:
+            if should_abort():
+                self.check_deadline()
+        try:
+            return future.result()
+        except requests.Timeout:
+            self.check_deadline()
+            raise DeadlineExceeded(self.stage)
+
     def update_state(self, key, value):
         self.state[key] = value
         self.state[f"{key}_logs"].append(value)
@@ -40,8 +86,7 @@ class InputValidationAgent(Agent):
         ('Car Model H', 35, '2024-12-06').
         Return 'valid' or 'invalid' as JSON.
         """
-        llm = self.get_llm(json_output=True)
-        validation_result = llm.invoke(validation_prompt)
+        validation_result = self.call_llm(validation_prompt, json_output=True)
         if "invalid" in validation_result.lower():
             self.update_state("validation_status", "invalid")
             self.update_state("error_message", "The provided query is not appropriate for processing.")
@@ -76,8 +121,7 @@ class SQLQueryAgent(Agent):
         ### User Input:
         {user_query}
         """
-        llm = self.get_llm(json_output=True)
-        sql_response = llm.invoke(prompt)
+        sql_response = self.call_llm(prompt, json_output=True)
         try:
             sql_query = json.loads(sql_response)
             if "query" in sql_query:
@@ -116,7 +160,8 @@ class SQLExecutorAgent(Agent):
             return self.state
 
         # Execute the SQL query
-        self.state = execute_snowflake_query(self.state, sql_query)
+        self.check_deadline()
+        self.state = execute_snowflake_query(self.state, sql_query, deadline=self.deadline, stage=self.stage)
         return self.state
 
 
@@ -137,7 +182,6 @@ class ResponseFormatterAgent(Agent):
         Convert the following SQL result into a human-readable response:
         {sql_result}
         """
-        llm = self.get_llm()
-        formatted_response = llm.invoke(prompt)
+        formatted_response = self.call_llm(prompt)
         self.update_state("formatted_response", formatted_response)
         return self.state
\ No newline at end of file
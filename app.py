@@ -2,16 +2,25 @@ from flask import Flask, request, jsonify
 import logging
 import base64
 import uuid
+import time
+import threading
 from waitress import serve
 from decouple import config
-from agent_graph.graph import create_graph, compile_workflow
+from agent_graph.graph import create_graph, compile_workflow, run_workflow
 from utils.helper_functions import serialize_event
+from utils.trace_recorder import start_trace, finish_trace
+from utils.deadline import DeadlineExceeded, cancel_request, clear_request
+from db.job_store import JobStore
+from workers.job_worker import start_workers, WEBHOOK_ALLOWED_HOSTS
+from utils.webhook_guard import webhook_url_error
 
 app = Flask(__name__)
 
 DEBUG_MODE = config("DEBUG", "False").lower() in ["true", "1", "yes"]
 temperature = int(config("LLM_TEMPERATURE", 0))
 iterations = int(config("ITERATIONS", 40))
+request_timeout = float(config("REQUEST_TIMEOUT_SECONDS", 120))
+job_workers = int(config("JOB_WORKERS", 2))
 app.debug = DEBUG_MODE
 
 logging_level = logging.DEBUG if DEBUG_MODE else logging.INFO
@@ -27,33 +36,48 @@ app.logger.info(f"🔍 Debug mode is {'ON' if DEBUG_MODE else 'OFF'}")
 graph = create_graph(temperature=temperature)
 workflow = compile_workflow(graph)
 
+# ✅ Jobs live in MongoDB; set JOB_WORKERS=0 when they are served by `python -m workers.job_worker`
+job_store = JobStore()
+if job_workers > 0:
+    start_workers(workflow, job_workers, store=job_store)
+
 @app.route("/query", methods=["POST"])
 def handle_query():
+    started = time.perf_counter()
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object."}), 400
+    trace = start_trace(data.get("query"))
+    # ✅ Waitress exposes this when channel_request_lookahead > 0
+    client_disconnected = request.environ.get("waitress.client_disconnected")
+    response, status_code = run_query(data, client_disconnected)
+    finish_trace(trace, status_code, (time.perf_counter() - started) * 1000)
+    return response, status_code
+
+def watch_client(thread_id, client_disconnected, done):
+    """
+    Cancels the request's in-flight work as soon as the client goes away.
+    """
+    while not done.wait(0.5):
+        if client_disconnected():
+            app.logger.warning(f"Client disconnected, cancelling thread_id={thread_id}")
+            cancel_request(thread_id)
+            return
+
+def run_query(data, client_disconnected=None):
+    thread_id = str(uuid.uuid4())
+    done = threading.Event()
+    if client_disconnected:
+        threading.Thread(target=watch_client, args=(thread_id, client_disconnected, done), daemon=True).start()
     try:
-        data = request.get_json()
         query = data.get("query")
-        thread_id = str(uuid.uuid4())
-
-        limit = {
-            "recursion_limit": iterations,
-            "configurable": {
-                "thread_id": str(thread_id),
-                "checkpoint_ns": "youtube-summary"
-            }
-        }
 
         if not query:
             return jsonify({"error": "Missing 'query' in request body."}), 400
-        
-        dict_inputs = {"user_query": query}
 
         # ✅ Fetch and process events
-        latest_event = None
-        for event in workflow.stream(dict_inputs, limit):
-            if "end_node" in event:
-                latest_event = serialize_event(event)  # ✅ Serialize event
-                break  # ✅ Stop after processing the first valid event
-        
+        latest_event = run_workflow(workflow, query, thread_id, time.time() + request_timeout, iterations)
+
         if latest_event is None:
             return jsonify({"message": "Query processed, but no relevant data found."}), 200
         
@@ -62,12 +86,75 @@ def handle_query():
             "values": latest_event
         }
         
-        return jsonify(response_data)
+        return jsonify(response_data), 200
+
+    except DeadlineExceeded as e:
+        app.logger.warning(f"Deadline exceeded in handle_query: {e}")
+        return jsonify({"error": str(e), "stage": e.stage, "reason": e.reason, "thread_id": thread_id}), e.status_code
 
     except Exception as e:
         app.logger.error(f"Error in handle_query: {e}")
         return jsonify({"error": str(e)}), 500
 
+    finally:
+        done.set()
+        clear_request(thread_id)
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object."}), 400
+        query = data.get("query")
+        if not query:
+            return jsonify({"error": "Missing 'query' in request body."}), 400
+        if not isinstance(query, str):
+            return jsonify({"error": "'query' must be a string."}), 400
+
+        webhook_url = data.get("webhook_url")
+        if webhook_url is not None:
+            webhook_error = webhook_url_error(webhook_url, WEBHOOK_ALLOWED_HOSTS)
+            if webhook_error:
+                return jsonify({"error": webhook_error}), 400
+
+        # ✅ Resubmitting with the same client key returns the original job
+        client_key = data.get("client_key") or request.headers.get("Idempotency-Key")
+        if client_key is not None and not isinstance(client_key, str):
+            return jsonify({"error": "'client_key' must be a string."}), 400
+        job, created = job_store.enqueue(query, client_key=client_key, webhook_url=webhook_url)
+
+        return jsonify({"job_id": job["_id"], "status": job["status"]}), 202 if created else 200
+
+    except Exception as e:
+        app.logger.error(f"Error in submit_job: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    try:
+        job = job_store.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found."}), 404
+
+        response_data = {
+            "job_id": job["_id"],
+            "status": job["status"],
+            "attempts": job.get("attempts", 0),
+            "created_at": job.get("created_at"),
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+            "error": job.get("error"),
+            "stage": job.get("stage"),
+            "webhook_status": job.get("webhook_status"),
+            "values": job.get("result")
+        }
+        return jsonify(response_data), 200
+
+    except Exception as e:
+        app.logger.error(f"Error in get_job: {e}")
+        return jsonify({"error": str(e)}), 500
+
 # Route to visualize the graph
 @app.route("/visualize", methods=["GET"])
 def visualize_graph():
@@ -135,6 +222,7 @@ def get_conversation_history():
                     "user_query": event_values.get("user_query", ""),
                     "sql_query": event_values.get("sql_query", ""),
                     "sql_result": event_values.get("sql_result", []),
+                    "sql_result_freshness": event_values.get("sql_result_freshness", {}),
                     "formatted_response": event_values.get("formatted_response", ""),
                     "formatted_response_logs": [
                         {
@@ -170,4 +258,4 @@ if __name__ == "__main__":
     if DEBUG_MODE:
         app.run(debug=True, host="0.0.0.0", port=8000)
     else:
-        serve(app, host="0.0.0.0", port=8000)
+        serve(app, host="0.0.0.0", port=8000, channel_request_lookahead=5)
@@ -0,0 +1,55 @@
+import logging
+from datetime import date, datetime, timezone
+from decouple import config
+from db.mongo_connection import initialize_mongo_client, get_database_from_client
+from utils.trace_recorder import encode_rows, decode_rows
+
+_collection = None
+
+
+def get_aggregate_collection():
+    """
+    Lazily opens the collection holding per-day partial aggregates for incremental queries.
+    """
+    global _collection
+    if _collection is None:
+        try:
+            client = initialize_mongo_client()
+            database = get_database_from_client(client)
+            _collection = database[config("INCREMENTAL_COLLECTION", default="incremental_aggregates")]
+        except Exception as e:
+            logging.error(f"Error retrieving incremental aggregate collection: {e}")
+            raise
+    return _collection
+
+
+def load_partials(key):
+    """
+    Returns (partials by day, watermark, built_at) for a query shape and window, or None if nothing is cached.
+    """
+    document = get_aggregate_collection().find_one({"_id": key})
+    if document is None:
+        return None
+    partials = {
+        date.fromisoformat(day): [list(row) for row in decode_rows(rows)]
+        for day, rows in document["days"].items()
+    }
+    watermark = date.fromisoformat(document["watermark"]) if document.get("watermark") else None
+    built_at = document["built_at"].replace(tzinfo=timezone.utc)
+    return partials, watermark, built_at
+
+
+def save_partials(key, sql_query, partials, watermark, built_at):
+    now = datetime.now(timezone.utc)
+    get_aggregate_collection().replace_one(
+        {"_id": key},
+        {
+            "_id": key,
+            "sql": sql_query,
+            "days": {day.isoformat(): encode_rows(rows) for day, rows in partials.items()},
+            "watermark": watermark.isoformat() if watermark else None,
+            "built_at": built_at,
+            "refreshed_at": now,
+        },
+        upsert=True
+    )
@@ -0,0 +1,137 @@
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from decouple import config
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from db.mongo_connection import initialize_mongo_client, get_database_from_client
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def get_job_collection():
+    try:
+        client = initialize_mongo_client()
+        database = get_database_from_client(client)
+        return database[config("JOB_COLLECTION", default="jobs")]
+    except Exception as e:
+        logging.error(f"Error retrieving job collection: {e}")
+        raise
+
+
+class JobStore:
+    """
+    Durable job queue backed by MongoDB.
+    Workers claim jobs with an expiring lease, so jobs held by a crashed worker
+    are picked up again once the lease runs out.
+    """
+    def __init__(self, collection=None, max_attempts=None):
+        self.collection = collection if collection is not None else get_job_collection()
+        self.max_attempts = max_attempts or int(config("JOB_MAX_ATTEMPTS", 3))
+        self.collection.create_index(
+            "client_key",
+            unique=True,
+            partialFilterExpression={"client_key": {"$type": "string"}}
+        )
+        self.collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+
+    def enqueue(self, user_query, client_key=None, webhook_url=None):
+        """
+        Adds a job to the queue. Returns (job, created); a repeated `client_key`
+        returns the existing job instead of enqueueing a duplicate.
+        """
+        now = datetime.now(timezone.utc)
+        job_id = str(uuid.uuid4())
+        job = {
+            "_id": job_id,
+            "user_query": user_query,
+            "webhook_url": webhook_url,
+            "status": QUEUED,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        if client_key:
+            job["client_key"] = client_key
+        try:
+            self.collection.insert_one(job)
+            return job, True
+        except DuplicateKeyError:
+            return self.collection.find_one({"client_key": client_key}), False
+
+    def get(self, job_id):
+        return self.collection.find_one({"_id": job_id})
+
+    def claim(self, worker_id, lease_seconds):
+        """
+        Atomically takes the oldest runnable job: queued, or running with an expired lease.
+        """
+        now = datetime.now(timezone.utc)
+        return self.collection.find_one_and_update(
+            {
+                "attempts": {"$lt": self.max_attempts},
+                "$or": [
+                    {"status": QUEUED},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def complete(self, job_id, worker_id, attempt, result):
+        return self._finish(job_id, worker_id, attempt, {"status": SUCCEEDED, "result": to_json_safe(result)})
+
+    def fail(self, job_id, worker_id, attempt, error, stage=None):
+        return self._finish(job_id, worker_id, attempt, {"status": FAILED, "error": error, "stage": stage})
+
+    def fail_exhausted(self):
+        """
+        Marks jobs whose lease expired on their last allowed attempt as failed.
+        """
+        now = datetime.now(timezone.utc)
+        return self.collection.update_many(
+            {
+                "status": RUNNING,
+                "lease_expires_at": {"$lt": now},
+                "attempts": {"$gte": self.max_attempts},
+            },
+            {"$set": {"status": FAILED, "error": "Job exceeded its maximum attempts.", "updated_at": now}},
+        ).modified_count
+
+    def record_webhook(self, job_id, status):
+        self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"webhook_status": status, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+    def _finish(self, job_id, worker_id, attempt, fields):
+        # ✅ Only the worker holding the current lease may finish the job; `attempts` is
+        # bumped on every claim, so a stale worker whose lease was taken over is fenced out
+        now = datetime.now(timezone.utc)
+        return self.collection.find_one_and_update(
+            {"_id": job_id, "status": RUNNING, "worker_id": worker_id, "attempts": attempt},
+            {"$set": {**fields, "finished_at": now, "updated_at": now}, "$unset": {"lease_expires_at": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+def to_json_safe(value):
+    """
+    Snowflake rows can hold dates and decimals, which BSON cannot store; keep the JSON view of them.
+    """
+    return json.loads(json.dumps(value, default=str))
@@ -1,11 +1,13 @@
 import base64
 import json
 import requests
+import time
 from datetime import datetime, timezone
 from decouple import config
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
 from utils.helper_functions import format_response_to_json
+from utils.trace_recorder import record_gemini_call
 
 class GeminiModel:
     def __init__(self, model, temperature=0, json_output=False):
@@ -17,18 +19,25 @@ class GeminiModel:
         self.model = model
         self.location = config("GCP_PROJECT_LOCATION", default="us-central1")
         self.json_output = json_output
-
-        # 🔹 Load & Authenticate Service Account
-        self.credentials = self.authenticate_service_account(self.load_service_account_key())
+        # 🔹 Replay runs point these at the stand-in Gemini server, which needs no credentials
+        self.base_url = config("GEMINI_API_BASE_URL", default=f"https://{self.location}-aiplatform.googleapis.com")
+        self.skip_auth = config("GEMINI_SKIP_AUTH", default="False").lower() in ["true", "1", "yes"]
 
         # 🔹 Store Token & Expiry
         self.access_token = None
         self.token_expiry = datetime.now(timezone.utc)  # Default expiry time
-        self.refresh_token()  # Get an initial valid token
+
+        if self.skip_auth:
+            self.credentials = None
+            self.headers = {"Content-Type": "application/json; charset=utf-8"}
+        else:
+            # 🔹 Load & Authenticate Service Account
+            self.credentials = self.authenticate_service_account(self.load_service_account_key())
+            self.refresh_token()  # Get an initial valid token
 
         # 🔹 API Endpoint
         self.endpoint = (
-            f"https://{self.location}-aiplatform.googleapis.com/v1/projects/{self.project_id}/"
+            f"{self.base_url.rstrip('/')}/v1/projects/{self.project_id}/"
             f"locations/{self.location}/publishers/google/models/{model}:streamGenerateContent"
         )
 
@@ -36,6 +45,8 @@ class GeminiModel:
         """
         Refresh the access token only if it's expired.
         """
+        if self.skip_auth:
+            return
         try:
             if not self.credentials.valid or self.credentials.expired:
                 request = Request()
@@ -78,9 +89,11 @@ class GeminiModel:
         except Exception as e:
             raise ValueError(f"Failed to decode service account key: {e}")
 
-    def invoke(self, messages, generation_config=None):
+    def invoke(self, messages, generation_config=None, timeout=None, should_abort=None):
         """
         Invoke the model with a list of messages, optional safety settings, and generation configurations.
+        `timeout` (seconds) bounds each socket read; `should_abort` is checked between response
+        chunks so a trickling response stops once it returns True. Both raise requests.Timeout.
         Returns the response as a HumanMessage object.
         """
 
@@ -110,9 +123,14 @@ class GeminiModel:
             payload["generation_config"]["response_mime_type"] = "application/json"
 
         try:
-            response = requests.post(self.endpoint, headers=self.headers, data=json.dumps(payload))
+            started = time.perf_counter()
+            response = requests.post(
+                self.endpoint, headers=self.headers, data=json.dumps(payload), timeout=timeout, stream=True
+            )
+            response_body = self.read_response_body(response, should_abort)
+            record_gemini_call(payload, response.status_code, response_body, (time.perf_counter() - started) * 1000)
             response.raise_for_status()
-            response_data = response.json()
+            response_data = json.loads(response_body)
             # 🔹 Extracting & Formatting Response Text
             response_text = ""
             for item in response_data:
@@ -135,7 +153,28 @@ class GeminiModel:
 
             return response_text
 
+        except requests.Timeout:
+            raise
         except (requests.RequestException, ValueError, KeyError) as e:
             error_message = f"Error invoking the model: {e}"
             print("ERROR:", error_message)
             return json.dumps({"error": error_message})
+
+    @staticmethod
+    def read_response_body(response, should_abort=None):
+        """
+        Reads a streamed response, closing the connection early if `should_abort` returns True.
+        """
+        chunks = []
+        with response:
+            try:
+                for chunk in response.iter_content(chunk_size=4096):
+                    if should_abort and should_abort():
+                        raise requests.Timeout("Model call aborted before the response completed.")
+                    chunks.append(chunk)
+            except requests.ConnectionError as e:
+                # iter_content reports a read timeout as ConnectionError
+                if should_abort and should_abort():
+                    raise requests.Timeout(str(e))
+                raise
+        return b"".join(chunks).decode(response.encoding or "utf-8")
@@ -0,0 +1,122 @@
+import argparse
+import itertools
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from utils.trace_recorder import load_traces
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile over an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def send_query(session_local, target, user_query, timeout, scheduled_at):
+    """
+    Sends one query. On the open-loop schedule, latency is measured from `scheduled_at`,
+    the time the schedule meant to send it, so time spent queued behind saturated workers
+    is counted. In closed-loop mode (`scheduled_at` is None) it is measured from the send.
+    Returns (status code, latency ms, queueing delay ms).
+    """
+    if not hasattr(session_local, "session"):
+        session_local.session = requests.Session()
+    sent_at = time.perf_counter()
+    if scheduled_at is None:
+        scheduled_at = sent_at
+    queued_ms = max(sent_at - scheduled_at, 0.0) * 1000
+    try:
+        response = session_local.session.post(f"{target.rstrip('/')}/query", json={"query": user_query}, timeout=timeout)
+        status_code = response.status_code
+    except requests.RequestException:
+        status_code = None
+    return status_code, (time.perf_counter() - scheduled_at) * 1000, queued_ms
+
+
+def run_load(traces, target, qps, concurrency, total_requests, timeout):
+    """
+    Drives /query with the recorded user queries on an open-loop schedule of `qps`
+    requests per second, with at most `concurrency` requests in flight. With `qps` 0 it
+    runs closed-loop: each of `concurrency` workers sends its next request as soon as
+    the previous one is answered.
+    """
+    queries = itertools.cycle([trace["user_query"] for trace in traces])
+    session_local = threading.local()
+    futures = []
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(total_requests):
+            scheduled_at = None
+            if qps > 0:
+                scheduled_at = started + i / qps
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(executor.submit(send_query, session_local, target, next(queries), timeout, scheduled_at))
+        results = [future.result() for future in futures]
+
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for status_code, latency, _ in results if status_code == 200)
+    queue_delays = sorted(queued for _, _, queued in results)
+    return {
+        "requests": len(results),
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        # Included in latency_ms; reported separately to show when concurrency is the bottleneck
+        "queue_delay_ms": {
+            "p50": percentile(queue_delays, 50),
+            "p99": percentile(queue_delays, 99),
+            "max": queue_delays[-1] if queue_delays else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /query traffic against a running app.")
+    parser.add_argument("--trace", required=True, help="Trace file written with TRACE_RECORD_FILE.")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="Base URL of the app under test.")
+    parser.add_argument("--qps", type=float, default=5.0, help="Offered load; 0 sends as fast as concurrency allows.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight.")
+    parser.add_argument("--requests", type=int, default=None,
+                        help="Total requests to send (defaults to one pass over the trace).")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request client timeout in seconds.")
+    parser.add_argument("--output", default=None, help="Also write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    traces = [trace for trace in load_traces(args.trace) if trace.get("user_query")]
+    if not traces:
+        raise SystemExit(f"No replayable traces in {args.trace}")
+
+    report = run_load(
+        traces,
+        target=args.target,
+        qps=args.qps,
+        concurrency=args.concurrency,
+        total_requests=args.requests or len(traces),
+        timeout=args.timeout,
+    )
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import logging
+import threading
+import time
+from flask import Flask, Response, request, jsonify
+from waitress import serve
+from utils.trace_recorder import load_traces, prompt_key
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("replay.standins")
+
+
+def create_gemini_app(traces, latency_scale=1.0):
+    """
+    Stand-in for the Vertex AI streamGenerateContent endpoint.
+    Answers each prompt with the recorded response body after the recorded latency.
+    """
+    app = Flask("gemini_standin")
+    recorded = {
+        call["prompt_key"]: call
+        for trace in traces
+        for call in trace.get("gemini", [])
+    }
+
+    @app.route(
+        "/v1/projects/<project>/locations/<location>/publishers/google/models/<path:model_method>",
+        methods=["POST"]
+    )
+    def generate_content(project, location, model_method):
+        payload = request.get_json(silent=True) or {}
+        call = recorded.get(prompt_key(payload))
+        if call is None:
+            logger.warning("No recorded Gemini response for prompt; returning 404.")
+            return jsonify({"error": "No recorded response for this prompt."}), 404
+
+        time.sleep(call["elapsed_ms"] * latency_scale / 1000)
+        return Response(call["response"], status=call["status_code"], mimetype="application/json")
+
+    return app
+
+
+def create_snowflake_app(traces, latency_scale=1.0):
+    """
+    Stand-in for Snowflake used by tools.snowflake_tools.execute_standin_query.
+    Answers each SQL statement with the recorded rows after the recorded latency.
+    """
+    app = Flask("snowflake_standin")
+    recorded = {
+        query["sql"]: query
+        for trace in traces
+        for query in trace.get("snowflake", [])
+    }
+
+    @app.route("/query", methods=["POST"])
+    def run_query():
+        sql_query = (request.get_json(silent=True) or {}).get("sql", "")
+        query = recorded.get(sql_query)
+        if query is None:
+            logger.warning("No recorded Snowflake result for SQL; returning 404.")
+            return jsonify({"error": "No recorded result for this SQL."}), 404
+
+        time.sleep(query["elapsed_ms"] * latency_scale / 1000)
+        return jsonify({"rows": query["rows"], "error": query["error"]})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Gemini and Snowflake responses for load replay.")
+    parser.add_argument("--trace", required=True, help="Trace file written with TRACE_RECORD_FILE.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--gemini-port", type=int, default=8101)
+    parser.add_argument("--snowflake-port", type=int, default=8102)
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier applied to recorded latencies (0 disables the delay).")
+    parser.add_argument("--threads", type=int, default=32, help="Waitress threads per stand-in server.")
+    args = parser.parse_args()
+
+    traces = load_traces(args.trace)
+    logger.info(f"Loaded {len(traces)} traces from {args.trace}")
+
+    servers = [
+        (create_gemini_app(traces, args.latency_scale), args.gemini_port),
+        (create_snowflake_app(traces, args.latency_scale), args.snowflake_port),
+    ]
+    threads = [
+        threading.Thread(
+            target=serve,
+            args=(stand_in,),
+            kwargs={"host": args.host, "port": port, "threads": args.threads},
+            daemon=True
+        )
+        for stand_in, port in servers
+    ]
+    for thread in threads:
+        thread.start()
+
+    logger.info(f"Gemini stand-in:    GEMINI_API_BASE_URL=http://{args.host}:{args.gemini_port} GEMINI_SKIP_AUTH=True")
+    logger.info(f"Snowflake stand-in: SNOWFLAKE_STANDIN_URL=http://{args.host}:{args.snowflake_port}")
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ class AgentGraphState(TypedDict):
     error_message: str
     sql_query: str
     sql_result: list
+    sql_result_freshness: dict  # only set for incremental results
     formatted_response: str
     validation_logs: Annotated[list, add_messages]
     query_logs: Annotated[list, add_messages]
@@ -32,6 +33,7 @@ state = {
     "error_message": "",
     "sql_query": "",
     "sql_result": [],
+    "sql_result_freshness": {},
     "formatted_response": "",
     "validation_logs": [],
     "query_logs": [],
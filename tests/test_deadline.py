@@ -0,0 +1,56 @@
+import time
+import pytest
+from utils.deadline import Deadline, DeadlineExceeded, cancel_request, clear_request
+
+
+def test_check_passes_with_budget_left():
+    deadline = Deadline(time.time() + 60, request_id="thread-ok")
+    deadline.check("query_converter")
+    assert 0 < deadline.remaining() <= 60
+    assert not deadline.expired()
+
+
+def test_check_raises_timeout_once_expired():
+    deadline = Deadline(time.time() - 1, request_id="thread-expired")
+    assert deadline.remaining() == 0.0
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        deadline.check("sql_executor")
+    assert excinfo.value.stage == "sql_executor"
+    assert excinfo.value.reason == "timeout"
+    assert excinfo.value.status_code == 504
+    assert "sql_executor" in str(excinfo.value)
+
+
+def test_check_reports_cancellation_before_expiry():
+    deadline = Deadline(time.time() - 1, request_id="thread-cancelled")
+    cancel_request("thread-cancelled")
+    try:
+        assert deadline.cancelled()
+        with pytest.raises(DeadlineExceeded) as excinfo:
+            deadline.check("response_formatter")
+        assert excinfo.value.stage == "response_formatter"
+        assert excinfo.value.reason == "cancelled"
+        assert excinfo.value.status_code == 499
+    finally:
+        clear_request("thread-cancelled")
+    assert not deadline.cancelled()
+
+
+def test_cancellation_is_scoped_to_its_request():
+    cancel_request("thread-a")
+    try:
+        Deadline(time.time() + 60, request_id="thread-b").check("sql_executor")
+    finally:
+        clear_request("thread-a")
+
+
+def test_from_config_reads_deadline_and_thread_id():
+    expires_at = time.time() + 30
+    deadline = Deadline.from_config({"configurable": {"thread_id": "abc", "deadline": expires_at}})
+    assert deadline.expires_at == expires_at
+    assert deadline.request_id == "abc"
+
+
+@pytest.mark.parametrize("config", [None, {}, {"configurable": {"thread_id": "abc"}}])
+def test_from_config_without_deadline_returns_none(config):
+    assert Deadline.from_config(config) is None
@@ -0,0 +1,177 @@
+from datetime import date, datetime
+import pytest
+from tools.incremental_query import plan_incremental
+
+TABLE = "ga_schema.sales_data"
+
+
+def plan(sql):
+    result = plan_incremental(sql)
+    assert result is not None, sql
+    return result
+
+
+# ✅ Recognizer: accepted shapes
+
+def test_accepts_grouped_rolling_window_with_alias_order_and_limit():
+    p = plan(
+        f"SELECT product_name, SUM(quantity_sold) AS total FROM {TABLE} "
+        "WHERE sale_date >= DATEADD(day, -7, CURRENT_DATE()) GROUP BY product_name ORDER BY total DESC LIMIT 5;"
+    )
+    assert p.group_exprs == ["product_name"]
+    assert [item.aggregate for item in p.select_items] == [None, "SUM"]
+    assert p.date_conditions == [(">=", "DATEADD(day, -7, CURRENT_DATE())")]
+    assert p.order_by == [(1, True, True)]
+    assert p.limit == 5
+
+
+def test_accepts_alias_without_as_and_positional_group_and_order():
+    p = plan(f"SELECT product_name, COUNT(*) sales FROM {TABLE} WHERE sale_date > '2025-01-01' GROUP BY 1 ORDER BY 2 ASC")
+    assert p.select_items[1].name == "sales"
+    assert p.order_by == [(1, False, False)]
+
+
+def test_accepts_between_with_other_filters():
+    p = plan(
+        f"SELECT SUM(quantity_sold) FROM {TABLE} "
+        "WHERE sale_date BETWEEN '2025-01-01' AND '2025-01-31' AND product_name = 'Car Model I'"
+    )
+    assert p.date_conditions == [(">=", "'2025-01-01'"), ("<=", "'2025-01-31'")]
+    assert p.group_exprs == []
+
+
+@pytest.mark.parametrize("sql", [
+    f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' OR product_name = 'x'",
+    f"SELECT product_name, SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name HAVING SUM(quantity_sold) > 1",
+    f"SELECT COUNT(DISTINCT product_name) FROM {TABLE} WHERE sale_date >= '2025-01-01'",
+    f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date = CURRENT_DATE",
+    f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date <> CURRENT_DATE",
+    f"SELECT AVG(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01'",
+    f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date <= '2025-01-31'",
+    f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE YEAR(sale_date) = 2025",
+    f"SELECT product_name, SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY 2",
+    f"SELECT product_name, SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01'",
+    f"SELECT product_name, SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name ORDER BY quantity_sold",
+    f"SELECT SUM(quantity_sold) FROM other_schema.sales WHERE sale_date >= '2025-01-01'",
+    f"SELECT product_name FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name",
+])
+def test_rejects_unsupported_queries(sql):
+    assert plan_incremental(sql) is None
+
+
+# ✅ SQL rewriting
+
+def test_delta_sql_rereads_from_watermark_and_groups_by_day():
+    p = plan(f"SELECT product_name, SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name")
+    assert p.delta_sql() == (
+        f"SELECT product_name, sale_date AS incremental_day, SUM(quantity_sold) FROM {TABLE} "
+        "WHERE sale_date >= '2025-01-01' GROUP BY product_name, sale_date"
+    )
+    assert "AND sale_date >= '2025-01-05'::DATE" in p.delta_sql(date(2025, 1, 5))
+
+
+def test_bounds_sql_casts_every_bound():
+    p = plan(f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date BETWEEN '2025-01-01' AND CURRENT_DATE")
+    assert p.bounds_sql() == "SELECT TO_TIMESTAMP_NTZ('2025-01-01'), TO_TIMESTAMP_NTZ(CURRENT_DATE)"
+
+
+# ✅ Window bounds as returned by Snowflake (or left as literals)
+
+def test_in_window_with_literal_string_bound():
+    p = plan(f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01'")
+    assert p.in_window(date(2025, 1, 3), ["2025-01-01"])
+    assert p.in_window(date(2025, 1, 1), ["2025-01-01"])
+    assert not p.in_window(date(2024, 12, 31), ["2025-01-01"])
+
+
+def test_in_window_with_between_bounds():
+    p = plan(f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date BETWEEN '2025-01-01' AND '2025-01-31'")
+    bounds = [datetime(2025, 1, 1), datetime(2025, 1, 31)]
+    assert p.in_window(date(2025, 1, 31), bounds)
+    assert not p.in_window(date(2025, 2, 1), bounds)
+    assert not p.in_window(date(2024, 12, 31), bounds)
+
+
+def test_in_window_with_dateadd_current_date_bound():
+    p = plan(f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date > DATEADD(day, -7, CURRENT_DATE())")
+    bounds = [datetime(2025, 1, 8)]
+    assert p.in_window(date(2025, 1, 9), bounds)
+    assert not p.in_window(date(2025, 1, 8), bounds)
+    assert p.in_window(date(2025, 1, 9), [date(2025, 1, 8)])
+
+
+# ✅ Merging partials
+
+def test_merge_empty_ungrouped_returns_one_row():
+    p = plan(f"SELECT COUNT(*), SUM(quantity_sold), MAX(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01'")
+    assert p.merge([]) == [(0, None, None)]
+
+
+def test_merge_combines_days_per_group():
+    p = plan(
+        f"SELECT product_name, SUM(quantity_sold), COUNT(*), MIN(quantity_sold), MAX(quantity_sold) FROM {TABLE} "
+        "WHERE sale_date >= '2025-01-01' GROUP BY product_name"
+    )
+    rows = p.merge([["A", 3, 1, 3, 3], ["A", 4, 2, 1, 3], ["B", None, 1, None, None]])
+    assert sorted(rows, key=lambda row: row[0]) == [("A", 7, 3, 1, 3), ("B", None, 1, None, None)]
+
+
+def test_merge_orders_nulls_like_snowflake():
+    desc = plan(f"SELECT product_name, SUM(quantity_sold) AS total FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name ORDER BY total DESC")
+    asc = plan(f"SELECT product_name, SUM(quantity_sold) AS total FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name ORDER BY total")
+    explicit = plan(f"SELECT product_name, SUM(quantity_sold) AS total FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name ORDER BY total ASC NULLS FIRST")
+    partials = [["A", 3], ["B", None], ["C", 9]]
+    assert [row[0] for row in desc.merge(partials)] == ["B", "C", "A"]
+    assert [row[0] for row in asc.merge(partials)] == ["A", "C", "B"]
+    assert [row[0] for row in explicit.merge(partials)] == ["B", "A", "C"]
+
+
+def test_merge_applies_limit_after_ordering():
+    p = plan(f"SELECT product_name, SUM(quantity_sold) AS total FROM {TABLE} WHERE sale_date >= '2025-01-01' GROUP BY product_name ORDER BY total DESC LIMIT 2")
+    assert p.merge([["A", 1], ["B", 5], ["C", 3], ["A", 1]]) == [("B", 5), ("C", 3)]
+
+
+# ✅ Watermark handling and window expiry
+
+def grouped_plan():
+    return plan(f"SELECT product_name, SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= DATEADD(day, -7, CURRENT_DATE()) GROUP BY product_name")
+
+
+def test_apply_delta_replaces_the_watermark_day():
+    p = grouped_plan()
+    partials = {date(2025, 1, 9): [["A", 5]], date(2025, 1, 10): [["A", 2]]}
+    delta = [("A", date(2025, 1, 10), 6), ("B", date(2025, 1, 11), 1)]
+    partials, watermark = p.apply_delta(partials, date(2025, 1, 10), delta, [datetime(2025, 1, 4)])
+    assert partials == {date(2025, 1, 9): [["A", 5]], date(2025, 1, 10): [["A", 6]], date(2025, 1, 11): [["B", 1]]}
+    assert watermark == date(2025, 1, 11)
+    assert sorted(p.merge([row for rows in partials.values() for row in rows])) == [("A", 11), ("B", 1)]
+
+
+def test_apply_delta_expires_days_that_left_the_window():
+    p = grouped_plan()
+    partials = {date(2025, 1, 3): [["A", 5]], date(2025, 1, 9): [["A", 2]]}
+    partials, watermark = p.apply_delta(partials, date(2025, 1, 9), [], [datetime(2025, 1, 4)])
+    assert partials == {}
+    assert watermark == date(2025, 1, 9)
+
+
+def test_apply_delta_keeps_cached_days_without_new_rows():
+    p = grouped_plan()
+    partials = {date(2025, 1, 5): [["A", 5]], date(2025, 1, 9): [["A", 2]]}
+    partials, watermark = p.apply_delta(partials, date(2025, 1, 10), [], [datetime(2025, 1, 4)])
+    assert partials == {date(2025, 1, 5): [["A", 5]], date(2025, 1, 9): [["A", 2]]}
+    assert watermark == date(2025, 1, 9)
+
+
+# ✅ Cache keys
+
+def test_key_ignores_keyword_case_and_whitespace():
+    a = plan(f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' AND product_name = 'Car Model I'")
+    b = plan(f"select  sum(quantity_sold)\nfrom {TABLE.upper()} where SALE_DATE >= '2025-01-01' and PRODUCT_NAME = 'Car Model I'")
+    assert a.key == b.key
+
+
+def test_key_keeps_literal_case():
+    a = plan(f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' AND product_name = 'Car Model I'")
+    b = plan(f"SELECT SUM(quantity_sold) FROM {TABLE} WHERE sale_date >= '2025-01-01' AND product_name = 'car model i'")
+    assert a.key != b.key
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from db.job_store import JobStore, QUEUED, RUNNING, SUCCEEDED, FAILED
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def store():
+    return JobStore(collection=mongomock.MongoClient().db.jobs, max_attempts=2)
+
+
+def expire_lease(store, job_id):
+    store.collection.update_one(
+        {"_id": job_id},
+        {"$set": {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+
+def test_enqueue_with_duplicate_client_key_returns_existing_job(store):
+    job, created = store.enqueue("sales this month", client_key="client-1")
+    duplicate, duplicate_created = store.enqueue("sales this month", client_key="client-1")
+    assert created is True
+    assert duplicate_created is False
+    assert duplicate["_id"] == job["_id"]
+    assert store.collection.count_documents({}) == 1
+
+
+def test_enqueue_without_client_key_always_creates(store):
+    store.enqueue("sales this month")
+    store.enqueue("sales this month")
+    assert store.collection.count_documents({}) == 2
+
+
+def test_claim_takes_oldest_queued_job_and_bumps_attempts(store):
+    first, _ = store.enqueue("first")
+    store.enqueue("second")
+    claimed = store.claim("worker-a", lease_seconds=60)
+    assert claimed["_id"] == first["_id"]
+    assert claimed["status"] == RUNNING
+    assert claimed["worker_id"] == "worker-a"
+    assert claimed["attempts"] == 1
+
+
+def test_claim_skips_running_job_with_live_lease(store):
+    store.enqueue("only")
+    assert store.claim("worker-a", lease_seconds=60) is not None
+    assert store.claim("worker-b", lease_seconds=60) is None
+
+
+def test_complete_by_lease_holder_succeeds(store):
+    job, _ = store.enqueue("only")
+    claimed = store.claim("worker-a", lease_seconds=60)
+    finished = store.complete(job["_id"], "worker-a", claimed["attempts"], {"end_node": {"sql_result": [[1]]}})
+    assert finished["status"] == SUCCEEDED
+    assert finished["result"] == {"end_node": {"sql_result": [[1]]}}
+
+
+def test_stale_worker_cannot_finish_after_takeover(store):
+    job, _ = store.enqueue("only")
+    stale = store.claim("worker-a", lease_seconds=60)
+    expire_lease(store, job["_id"])
+    current = store.claim("worker-b", lease_seconds=60)
+    assert current["attempts"] == stale["attempts"] + 1
+
+    assert store.complete(job["_id"], "worker-a", stale["attempts"], {"stale": True}) is None
+    assert store.fail(job["_id"], "worker-a", stale["attempts"], "boom") is None
+    assert store.get(job["_id"])["status"] == RUNNING
+
+    finished = store.complete(job["_id"], "worker-b", current["attempts"], {"fresh": True})
+    assert finished["result"] == {"fresh": True}
+
+
+def test_same_worker_id_with_old_attempt_is_fenced(store):
+    job, _ = store.enqueue("only")
+    first = store.claim("worker-a", lease_seconds=60)
+    expire_lease(store, job["_id"])
+    store.claim("worker-a", lease_seconds=60)
+    assert store.complete(job["_id"], "worker-a", first["attempts"], {"stale": True}) is None
+
+
+def test_fail_exhausted_marks_jobs_on_their_last_attempt(store):
+    job, _ = store.enqueue("only")
+    for worker in ("worker-a", "worker-b"):
+        assert store.claim(worker, lease_seconds=60) is not None
+        expire_lease(store, job["_id"])
+
+    # No attempts left, so nobody can claim it and the reaper fails it
+    assert store.claim("worker-c", lease_seconds=60) is None
+    assert store.fail_exhausted() == 1
+    failed = store.get(job["_id"])
+    assert failed["status"] == FAILED
+    assert "maximum attempts" in failed["error"]
+
+
+def test_fail_exhausted_leaves_live_and_retryable_jobs(store):
+    live, _ = store.enqueue("live")
+    retryable, _ = store.enqueue("retryable")
+    store.claim("worker-a", lease_seconds=60)
+    store.claim("worker-b", lease_seconds=60)
+    expire_lease(store, retryable["_id"])
+    assert store.fail_exhausted() == 0
+    assert store.get(live["_id"])["status"] == RUNNING
+    assert store.get(retryable["_id"])["status"] == RUNNING
+    assert store.get(retryable["_id"])["attempts"] < store.max_attempts
+
+
+def test_new_job_is_queued(store):
+    job, _ = store.enqueue("only", webhook_url="https://example.com/hook")
+    assert store.get(job["_id"])["status"] == QUEUED
@@ -0,0 +1,53 @@
+import socket
+import pytest
+from utils import webhook_guard
+from utils.webhook_guard import webhook_url_error
+
+
+def resolve_to(monkeypatch, *addresses):
+    monkeypatch.setattr(
+        webhook_guard.socket,
+        "getaddrinfo",
+        lambda host, port: [(socket.AF_INET, socket.SOCK_STREAM, 0, "", (address, 0)) for address in addresses]
+    )
+
+
+@pytest.mark.parametrize("url", [123, None, "ftp://example.com/hook", "not a url", "https:///path"])
+def test_rejects_non_http_urls(url):
+    assert webhook_url_error(url) is not None
+
+
+@pytest.mark.parametrize("address", ["169.254.169.254", "127.0.0.1", "10.0.0.5", "192.168.1.1", "::1", "0.0.0.0"])
+def test_rejects_non_public_destinations(monkeypatch, address):
+    resolve_to(monkeypatch, address)
+    assert "non-public" in webhook_url_error("http://hooks.example.com/done")
+
+
+def test_rejects_host_with_any_private_address(monkeypatch):
+    resolve_to(monkeypatch, "93.184.216.34", "10.0.0.5")
+    assert webhook_url_error("https://hooks.example.com/done") is not None
+
+
+def test_accepts_public_destination(monkeypatch):
+    resolve_to(monkeypatch, "93.184.216.34")
+    assert webhook_url_error("https://hooks.example.com/done") is None
+
+
+def test_rejects_unresolvable_host(monkeypatch):
+    def fail(host, port):
+        raise socket.gaierror("no such host")
+    monkeypatch.setattr(webhook_guard.socket, "getaddrinfo", fail)
+    assert "could not be resolved" in webhook_url_error("https://missing.example.com/")
+
+
+def test_allowlist_accepts_listed_hosts_and_subdomains():
+    allowed = ["hooks.example.com", ".internal.example.org"]
+    assert webhook_url_error("https://hooks.example.com/done", allowed) is None
+    assert webhook_url_error("http://ci.internal.example.org/job", allowed) is None
+    assert webhook_url_error("http://internal.example.org/job", allowed) is None
+
+
+def test_allowlist_rejects_other_hosts():
+    allowed = ["hooks.example.com"]
+    assert "not in the allowed hosts" in webhook_url_error("http://169.254.169.254/latest", allowed)
+    assert webhook_url_error("https://evilhooks.example.com/", allowed) is not None
@@ -0,0 +1,326 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import List, Optional
+
+# ✅ Only aggregates over this table's sale_date ranges are executed incrementally
+INCREMENTAL_TABLE = "ga_schema.sales_data"
+DATE_COLUMN = "sale_date"
+DAY_ALIAS = "incremental_day"
+
+MERGEABLE_AGGREGATES = ("SUM", "COUNT", "MIN", "MAX")
+
+QUERY_PATTERN = re.compile(
+    r"^SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<table>[A-Za-z0-9_.]+)\s+WHERE\s+(?P<where>.+?)"
+    r"(?:\s+GROUP\s+BY\s+(?P<group>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?$",
+    re.IGNORECASE | re.DOTALL
+)
+IDENTIFIER = r"[A-Za-z_][A-Za-z0-9_]*"
+COLUMN_PATTERN = re.compile(rf"^(?:{IDENTIFIER}\.)?(?P<name>{IDENTIFIER})$")
+AGGREGATE_PATTERN = re.compile(rf"^(?P<func>{'|'.join(MERGEABLE_AGGREGATES)})\s*\(\s*(?P<arg>\*|(?:{IDENTIFIER}\.)?{IDENTIFIER})\s*\)$", re.IGNORECASE)
+SELECT_ITEM_PATTERN = re.compile(rf"^(?P<expr>.+?)(?:\s+(?:AS\s+)?(?P<alias>{IDENTIFIER}))?$", re.IGNORECASE | re.DOTALL)
+DATE_CONDITION_PATTERN = re.compile(rf"^(?:{IDENTIFIER}\.)?{DATE_COLUMN}\s*(?P<op>>=|<=|>|<)(?![=>])\s*(?P<expr>.+)$", re.IGNORECASE | re.DOTALL)
+BETWEEN_PATTERN = re.compile(rf"^(?:{IDENTIFIER}\.)?{DATE_COLUMN}\s+BETWEEN\s+(?P<low>.+?)\s+AND\s+(?P<high>.+)$", re.IGNORECASE | re.DOTALL)
+ORDER_ITEM_PATTERN = re.compile(r"^(?P<expr>.+?)(?:\s+(?P<dir>ASC|DESC))?(?:\s+NULLS\s+(?P<nulls>FIRST|LAST))?$", re.IGNORECASE | re.DOTALL)
+UNSUPPORTED_PATTERN = re.compile(r"\b(DISTINCT|HAVING|JOIN|UNION|OR|OVER|QUALIFY|SELECT)\b", re.IGNORECASE)
+
+
+@dataclass
+class SelectItem:
+    expr: str
+    name: str
+    aggregate: Optional[str] = None  # SUM/COUNT/MIN/MAX, or None for a grouping column
+
+
+@dataclass
+class IncrementalPlan:
+    """
+    A rolling-window aggregate rewritten into per-day partial aggregates that can be merged.
+    """
+    key: str
+    select_items: List[SelectItem]
+    group_exprs: List[str]
+    agg_exprs: List[str]
+    where: str
+    date_conditions: List[tuple]  # (operator, SQL expression) bounds on sale_date
+    order_by: List[tuple] = field(default_factory=list)  # (output index, descending, nulls_first)
+    limit: Optional[int] = None
+
+    def delta_sql(self, watermark=None):
+        """
+        Per-day partials for the window, restricted to days on or after `watermark`.
+        The watermark day itself is re-read because it may still be receiving rows.
+        """
+        where = self.where
+        if watermark is not None:
+            where = f"({where}) AND {DATE_COLUMN} >= '{watermark.isoformat()}'::DATE"
+        columns = ", ".join(self.group_exprs + [f"{DATE_COLUMN} AS {DAY_ALIAS}"] + self.agg_exprs)
+        group_by = ", ".join(dict.fromkeys(self.group_exprs + [DATE_COLUMN]))
+        return f"SELECT {columns} FROM {INCREMENTAL_TABLE} WHERE {where} GROUP BY {group_by}"
+
+    def bounds_sql(self):
+        """
+        Evaluates the window bounds without touching the table. Bounds are cast to
+        TIMESTAMP_NTZ because string literals would otherwise come back as VARCHAR.
+        """
+        return "SELECT " + ", ".join(f"TO_TIMESTAMP_NTZ({expr})" for _, expr in self.date_conditions)
+
+    def split_delta_row(self, row):
+        group_count = len(self.group_exprs)
+        day = as_date(row[group_count])
+        return day, list(row[:group_count]) + list(row[group_count + 1:])
+
+    def in_window(self, day, bounds):
+        for (op, _), bound in zip(self.date_conditions, bounds):
+            if bound is None:
+                return False
+            # Snowflake compares a DATE with a timestamp bound at midnight of that day
+            value = datetime.combine(day, datetime.min.time())
+            bound = as_datetime(bound)
+            if op == ">=" and not value >= bound:
+                return False
+            if op == ">" and not value > bound:
+                return False
+            if op == "<=" and not value <= bound:
+                return False
+            if op == "<" and not value < bound:
+                return False
+        return True
+
+    def apply_delta(self, partials, watermark, delta_rows, bounds):
+        """
+        Folds freshly fetched per-day rows into cached `partials` ({day: [partial rows]}).
+        Days on or after `watermark` were re-read, so their cached partials are replaced;
+        days that left the window are dropped. Returns (partials, new watermark).
+        """
+        if watermark is not None:
+            partials = {day: rows for day, rows in partials.items() if day < watermark}
+        else:
+            partials = {}
+        for row in delta_rows:
+            day, partial = self.split_delta_row(row)
+            partials.setdefault(day, []).append(partial)
+        partials = {day: rows for day, rows in partials.items() if self.in_window(day, bounds)}
+        return partials, max(partials, default=watermark)
+
+    def merge(self, partial_rows):
+        """
+        Folds per-day partial rows ([group values..., aggregate values...]) into the rows
+        the original query would have returned, in its column order, ordering and limit.
+        """
+        group_count = len(self.group_exprs)
+        aggregates = [item.aggregate for item in self.select_items if item.aggregate]
+        groups = {}
+        for row in partial_rows:
+            key = tuple(row[:group_count])
+            values = row[group_count:]
+            if key not in groups:
+                groups[key] = list(values)
+            else:
+                groups[key] = [
+                    merge_aggregate(func, current, value)
+                    for func, current, value in zip(aggregates, groups[key], values)
+                ]
+
+        # An ungrouped aggregate always returns one row, even over no data
+        if not self.group_exprs and not groups:
+            groups[()] = [0 if func == "COUNT" else None for func in aggregates]
+
+        rows = []
+        for key, values in groups.items():
+            group_values, agg_values = iter(key), iter(values)
+            rows.append(tuple(
+                next(agg_values) if item.aggregate else next(group_values)
+                for item in self.select_items
+            ))
+
+        # Stable sorts applied from the last ORDER BY key to the first
+        for index, descending, nulls_first in reversed(self.order_by):
+            none_high = nulls_first == descending
+            rows.sort(key=lambda row: ((row[index] is None) == none_high, row[index]), reverse=descending)
+
+        if self.limit is not None:
+            rows = rows[:self.limit]
+        return rows
+
+
+def plan_incremental(sql_query):
+    """
+    Returns an IncrementalPlan if `sql_query` is a SUM/COUNT/MIN/MAX aggregate over a
+    sale_date range of the sales table, or None if it must run as-is.
+    """
+    sql = " ".join(sql_query.strip().split())
+    match = QUERY_PATTERN.match(sql)
+    if not match or match.group("table").lower() != INCREMENTAL_TABLE:
+        return None
+    if UNSUPPORTED_PATTERN.search(match.group("select")) or UNSUPPORTED_PATTERN.search(match.group("where")):
+        return None
+
+    select_items = []
+    for raw_item in split_top_level(match.group("select"), ","):
+        item_match = SELECT_ITEM_PATTERN.match(raw_item)
+        expr, alias = item_match.group("expr").strip(), item_match.group("alias")
+        aggregate_match = AGGREGATE_PATTERN.match(expr)
+        column_match = COLUMN_PATTERN.match(expr)
+        if aggregate_match:
+            func = aggregate_match.group("func").upper()
+            select_items.append(SelectItem(expr=expr, name=(alias or expr).lower(), aggregate=func))
+        elif column_match:
+            select_items.append(SelectItem(expr=expr, name=(alias or column_match.group("name")).lower()))
+        else:
+            return None
+    if not any(item.aggregate for item in select_items):
+        return None
+
+    # Every selected column must be a grouping column and vice versa
+    group_exprs = [item.expr for item in select_items if not item.aggregate]
+    requested_groups = []
+    for raw_group in split_top_level(match.group("group") or "", ","):
+        if raw_group.isdigit():
+            position = int(raw_group) - 1
+            if not 0 <= position < len(select_items) or select_items[position].aggregate:
+                return None
+            requested_groups.append(select_items[position].expr.lower())
+        else:
+            requested_groups.append(raw_group.lower())
+    if sorted(requested_groups) != sorted(expr.lower() for expr in group_exprs):
+        return None
+
+    date_conditions = []
+    for condition in split_conditions(match.group("where")):
+        between_match = BETWEEN_PATTERN.match(condition)
+        date_match = DATE_CONDITION_PATTERN.match(condition)
+        if between_match:
+            date_conditions += [(">=", between_match.group("low")), ("<=", between_match.group("high"))]
+        elif date_match:
+            date_conditions.append((date_match.group("op"), date_match.group("expr")))
+        elif re.search(rf"\b{DATE_COLUMN}\b", condition, re.IGNORECASE):
+            return None
+    if not any(op in (">=", ">") for op, _ in date_conditions):
+        return None
+
+    order_by = []
+    for raw_order in split_top_level(match.group("order") or "", ","):
+        order_match = ORDER_ITEM_PATTERN.match(raw_order)
+        index = resolve_output_column(order_match.group("expr").strip(), select_items)
+        if index is None:
+            return None
+        descending = (order_match.group("dir") or "ASC").upper() == "DESC"
+        nulls = order_match.group("nulls")
+        nulls_first = descending if nulls is None else nulls.upper() == "FIRST"
+        order_by.append((index, descending, nulls_first))
+
+    return IncrementalPlan(
+        key=hashlib.sha256(lower_outside_quotes(sql).encode("utf-8")).hexdigest(),
+        select_items=select_items,
+        group_exprs=group_exprs,
+        agg_exprs=[item.expr for item in select_items if item.aggregate],
+        where=match.group("where"),
+        date_conditions=date_conditions,
+        order_by=order_by,
+        limit=int(match.group("limit")) if match.group("limit") else None,
+    )
+
+
+def merge_aggregate(func, current, value):
+    if current is None:
+        return value
+    if value is None:
+        return current
+    if func in ("SUM", "COUNT"):
+        return current + value
+    if func == "MIN":
+        return min(current, value)
+    return max(current, value)
+
+
+def resolve_output_column(expr, select_items):
+    if expr.isdigit():
+        index = int(expr) - 1
+        return index if 0 <= index < len(select_items) else None
+    lowered = expr.lower()
+    for index, item in enumerate(select_items):
+        if lowered in (item.name, item.expr.lower()):
+            return index
+    return None
+
+
+def lower_outside_quotes(text):
+    """
+    Lowercases keywords and identifiers but keeps quoted literals and identifiers as written,
+    since Snowflake compares them case-sensitively.
+    """
+    parts, quote = [], None
+    for char in text:
+        if quote:
+            quote = None if char == quote else quote
+            parts.append(char)
+        elif char in ("'", '"'):
+            quote = char
+            parts.append(char)
+        else:
+            parts.append(char.lower())
+    return "".join(parts)
+
+
+def split_top_level(text, separator):
+    """
+    Splits on `separator` outside parentheses and quotes.
+    """
+    parts, depth, quote, current = [], 0, None, ""
+    for char in text:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def split_conditions(where):
+    """
+    Splits a WHERE clause on top-level AND, keeping `x BETWEEN a AND b` together.
+    """
+    marked = re.sub(r"\s+AND\s+", "\x00", where, flags=re.IGNORECASE)
+    pieces = split_top_level(marked, "\x00")
+    conditions = []
+    for piece in pieces:
+        piece = piece.replace("\x00", " AND ")
+        if conditions and re.search(r"\bBETWEEN\s+[^\x00]+$", conditions[-1], re.IGNORECASE) \
+                and not re.search(r"\bAND\b", conditions[-1], re.IGNORECASE):
+            conditions[-1] = f"{conditions[-1]} AND {piece}"
+        else:
+            conditions.append(piece)
+    return conditions
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def as_datetime(value):
+    """
+    Normalizes a window bound to a naive datetime; string bounds are parsed as ISO dates/timestamps.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.combine(value, datetime.min.time())
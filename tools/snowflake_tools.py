@@ -1,29 +1,164 @@
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+import requests
 import snowflake.connector
 from states.agent_state import AgentGraphState
 from decouple import config
+from utils.trace_recorder import record_snowflake_query, decode_rows
+from utils.deadline import DeadlineExceeded
+from tools.incremental_query import plan_incremental
+from db.aggregate_cache import load_partials, save_partials
 
-def execute_snowflake_query(state: AgentGraphState, sql_query):
+# A running query is polled quickly at first, backing off to this interval
+QUERY_POLL_INITIAL_INTERVAL = 0.02
+QUERY_POLL_INTERVAL = float(config("SNOWFLAKE_POLL_INTERVAL_SECONDS", default=0.5))
+
+# Rolling-window aggregates fetch only rows newer than the cached watermark
+INCREMENTAL_EXECUTION = config("INCREMENTAL_EXECUTION", default="False").lower() in ["true", "1", "yes"]
+# Cached partials are rebuilt from scratch after this long, picking up late or corrected rows
+INCREMENTAL_FULL_REFRESH_HOURS = float(config("INCREMENTAL_FULL_REFRESH_HOURS", default=24))
+
+def execute_snowflake_query(state: AgentGraphState, sql_query, deadline=None, stage="sql_executor"):
     """
     Executes a SQL query on Snowflake and updates the agent state with the results.
+    The query runs asynchronously; if `deadline` passes or its request is cancelled,
+    the query is cancelled server-side by query id and DeadlineExceeded is raised.
+    With INCREMENTAL_EXECUTION, aggregates over sale_date ranges reuse cached per-day partials.
+    When SNOWFLAKE_STANDIN_URL is set, the query is sent to the replay stand-in server instead.
     """
-    conn = snowflake.connector.connect(
-        user=config("SNOWFLAKE_USER"),
-        password=config("SNOWFLAKE_PASSWORD"),
-        account=config("SNOWFLAKE_ACCOUNT"),
-        database=config("SNOWFLAKE_DATABASE"),
-        schema=config("SNOWFLAKE_SCHEMA"),
-        warehouse=config("SNOWFLAKE_WAREHOUSE")
-    )
-    
+    standin_url = config("SNOWFLAKE_STANDIN_URL", default="")
+    if standin_url:
+        return execute_standin_query(state, sql_query, standin_url, deadline=deadline, stage=stage)
+
+    started = time.perf_counter()
+    conn = connect_snowflake(deadline, stage)
+
     cursor = conn.cursor()
     try:
-        cursor.execute(sql_query)
-        result = cursor.fetchall()
+        plan = plan_incremental(sql_query) if INCREMENTAL_EXECUTION else None
+        freshness = None
+        if plan:
+            result, freshness = execute_incremental_query(conn, cursor, plan, sql_query, deadline, stage)
+        else:
+            result = run_statement(conn, cursor, sql_query, deadline, stage)
+        record_snowflake_query(sql_query, result, None, (time.perf_counter() - started) * 1000)
         state["sql_result"] = result
+        if freshness:
+            state["sql_result_freshness"] = freshness
         return state
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        record_snowflake_query(sql_query, None, str(e), (time.perf_counter() - started) * 1000)
         state["sql_result"] = f"Error executing SQL: {str(e)}"
         return state
     finally:
         cursor.close()
         conn.close()
+
+def connect_snowflake(deadline=None, stage="sql_executor"):
+    """
+    Opens a connection whose login and network timeouts fit in the remaining request budget.
+    """
+    timeouts = {}
+    if deadline:
+        deadline.check(stage)
+        budget = max(math.ceil(deadline.remaining()), 1)
+        timeouts = {"login_timeout": budget, "network_timeout": budget}
+    try:
+        return snowflake.connector.connect(
+            user=config("SNOWFLAKE_USER"),
+            password=config("SNOWFLAKE_PASSWORD"),
+            account=config("SNOWFLAKE_ACCOUNT"),
+            database=config("SNOWFLAKE_DATABASE"),
+            schema=config("SNOWFLAKE_SCHEMA"),
+            warehouse=config("SNOWFLAKE_WAREHOUSE"),
+            **timeouts
+        )
+    except Exception:
+        # A login cut short by the budget surfaces as a connector error; report it as a timeout
+        if deadline:
+            deadline.check(stage)
+        raise
+
+def run_statement(conn, cursor, sql_query, deadline=None, stage="sql_executor"):
+    """
+    Runs one statement asynchronously and returns its rows, cancelling it if the deadline passes.
+    """
+    cursor.execute_async(sql_query)
+    query_id = cursor.sfqid
+    interval = QUERY_POLL_INITIAL_INTERVAL
+    while conn.is_still_running(conn.get_query_status_throw_if_error(query_id)):
+        if deadline and (deadline.expired() or deadline.cancelled()):
+            cancel_snowflake_query(cursor, query_id)
+            deadline.check(stage)
+        # Fast queries finish within the first short polls; never sleep past the deadline
+        time.sleep(min(interval, deadline.remaining()) if deadline else interval)
+        interval = min(interval * 2, QUERY_POLL_INTERVAL)
+    cursor.get_results_from_sfqid(query_id)
+    return cursor.fetchall()
+
+def execute_incremental_query(conn, cursor, plan, sql_query, deadline=None, stage="sql_executor"):
+    """
+    Answers a rolling-window aggregate from cached per-day partials plus the rows on or
+    after the stored watermark, then merges them into the original query's result.
+    Returns (rows, freshness); freshness is None when the cache was unavailable and the
+    query ran as-is.
+    """
+    try:
+        now = datetime.now(timezone.utc)
+        cached = load_partials(plan.key)
+        if cached and now - cached[2] > timedelta(hours=INCREMENTAL_FULL_REFRESH_HOURS):
+            cached = None
+        partials, watermark, built_at = cached or ({}, None, now)
+
+        bounds = run_statement(conn, cursor, plan.bounds_sql(), deadline, stage)[0]
+        delta_rows = run_statement(conn, cursor, plan.delta_sql(watermark), deadline, stage)
+        partials, new_watermark = plan.apply_delta(partials, watermark, delta_rows, bounds)
+
+        save_partials(plan.key, sql_query, partials, new_watermark, built_at)
+        logging.info(f"Incremental query {plan.key[:12]}: {len(delta_rows)} new partials since {watermark}")
+        # Rows arriving late for days before the watermark only show up after the next rebuild
+        freshness = {
+            "fetched_at": now.isoformat(),
+            "built_at": built_at.isoformat(),
+            "watermark": new_watermark.isoformat() if new_watermark else None,
+        }
+        return plan.merge([row for rows in partials.values() for row in rows]), freshness
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.error(f"Incremental execution failed, running full query: {e}")
+        return run_statement(conn, cursor, sql_query, deadline, stage), None
+
+def cancel_snowflake_query(cursor, query_id):
+    """
+    Cancels a running query so it stops consuming warehouse time.
+    """
+    try:
+        cursor.execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,))
+        logging.info(f"Cancelled Snowflake query {query_id}")
+    except Exception as e:
+        logging.error(f"Failed to cancel Snowflake query {query_id}: {e}")
+
+def execute_standin_query(state: AgentGraphState, sql_query, standin_url, deadline=None, stage="sql_executor"):
+    """
+    Replays a recorded Snowflake result from the stand-in server (see replay/standins.py).
+    """
+    timeout = max(deadline.remaining(), 0.001) if deadline else None
+    try:
+        response = requests.post(f"{standin_url.rstrip('/')}/query", json={"sql": sql_query}, timeout=timeout)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("error"):
+            state["sql_result"] = f"Error executing SQL: {body['error']}"
+        else:
+            state["sql_result"] = decode_rows(body.get("rows", []))
+        return state
+    except requests.Timeout:
+        raise DeadlineExceeded(stage)
+    except (requests.RequestException, ValueError) as e:
+        state["sql_result"] = f"Error executing SQL: {str(e)}"
+        return state
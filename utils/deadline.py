@@ -0,0 +1,73 @@
+import threading
+import time
+
+# ✅ Requests whose client went away; nodes poll this to stop early
+_cancelled_requests = set()
+_cancelled_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised by a graph node when the request deadline passes or the client disconnects.
+    `stage` names the node that was running so the API can report it.
+    """
+    def __init__(self, stage, reason="timeout"):
+        self.stage = stage
+        self.reason = reason
+        if reason == "cancelled":
+            message = f"Stage '{stage}' was cancelled because the client disconnected."
+        else:
+            message = f"Stage '{stage}' timed out before the request deadline."
+        super().__init__(message)
+
+    @property
+    def status_code(self):
+        # 499 mirrors nginx's "client closed request"; nobody is listening anyway
+        return 499 if self.reason == "cancelled" else 504
+
+
+def cancel_request(request_id):
+    with _cancelled_lock:
+        _cancelled_requests.add(request_id)
+
+
+def clear_request(request_id):
+    with _cancelled_lock:
+        _cancelled_requests.discard(request_id)
+
+
+class Deadline:
+    """
+    Absolute wall-clock deadline for one request, carried in the `configurable`
+    section of the workflow config as `deadline` (epoch seconds) next to `thread_id`.
+    """
+    def __init__(self, expires_at, request_id=None):
+        self.expires_at = expires_at
+        self.request_id = request_id
+
+    @classmethod
+    def from_config(cls, config):
+        configurable = (config or {}).get("configurable", {})
+        expires_at = configurable.get("deadline")
+        if expires_at is None:
+            return None
+        return cls(expires_at, request_id=configurable.get("thread_id"))
+
+    def remaining(self):
+        return max(self.expires_at - time.time(), 0.0)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def cancelled(self):
+        with _cancelled_lock:
+            return self.request_id in _cancelled_requests
+
+    def check(self, stage):
+        """
+        Raises DeadlineExceeded for `stage` if the client is gone or no time is left.
+        """
+        if self.cancelled():
+            raise DeadlineExceeded(stage, reason="cancelled")
+        if self.expired():
+            raise DeadlineExceeded(stage)
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import date, datetime
+from decimal import Decimal
+from decouple import config
+from utils.helper_functions import get_current_utc_datetime
+
+# ✅ When set, every /query is captured as one JSON line in this file
+TRACE_RECORD_FILE = config("TRACE_RECORD_FILE", default="")
+
+_current_trace = ContextVar("current_trace", default=None)
+_write_lock = threading.Lock()
+
+
+def recording_enabled():
+    return bool(TRACE_RECORD_FILE)
+
+
+def start_trace(user_query):
+    """
+    Starts capturing a trace for the current request.
+    Gemini and Snowflake calls made while the trace is active are appended to it.
+    Returns None when recording is disabled.
+    """
+    if not recording_enabled():
+        return None
+    trace = {
+        "trace_id": str(uuid.uuid4()),
+        "recorded_at": get_current_utc_datetime(),
+        "user_query": user_query,
+        "gemini": [],
+        "snowflake": [],
+    }
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace, status_code, elapsed_ms):
+    """
+    Stops capturing and appends the trace to TRACE_RECORD_FILE.
+    """
+    _current_trace.set(None)
+    if trace is None:
+        return
+    trace["status_code"] = status_code
+    trace["elapsed_ms"] = round(elapsed_ms, 3)
+    line = json.dumps(trace, ensure_ascii=False, default=str)
+    with _write_lock:
+        with open(TRACE_RECORD_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def record_gemini_call(request_payload, status_code, response_body, elapsed_ms):
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace["gemini"].append({
+        "prompt_key": prompt_key(request_payload),
+        "request": request_payload,
+        "status_code": status_code,
+        "response": response_body,
+        "elapsed_ms": round(elapsed_ms, 3),
+    })
+
+
+def record_snowflake_query(sql_query, rows, error, elapsed_ms):
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace["snowflake"].append({
+        "sql": sql_query,
+        "rows": encode_rows(rows) if error is None else None,
+        "error": error,
+        "elapsed_ms": round(elapsed_ms, 3),
+    })
+
+
+def prompt_key(request_payload):
+    """
+    Stable key for a Gemini request, used by the stand-in server to find the recorded response.
+    """
+    contents = json.dumps(request_payload.get("contents", []), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contents.encode("utf-8")).hexdigest()
+
+
+def load_traces(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ✅ Snowflake rows carry dates and decimals; keep their types so replayed prompts match byte-for-byte
+def encode_rows(rows):
+    return [[_encode_value(value) for value in row] for row in rows]
+
+
+def decode_rows(rows):
+    return [tuple(_decode_value(value) for value in row) for row in rows]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+        if "__date__" in value:
+            return date.fromisoformat(value["__date__"])
+        if "__decimal__" in value:
+            return Decimal(value["__decimal__"])
+    return value
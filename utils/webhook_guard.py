@@ -0,0 +1,35 @@
+import ipaddress
+import socket
+from urllib.parse import urlparse
+
+
+def webhook_url_error(url, allowed_hosts=()):
+    """
+    Returns why `url` may not receive job results, or None if it may.
+    With `allowed_hosts`, only those hosts (or subdomains of entries starting with ".")
+    are accepted. Without it, hosts resolving to private, loopback, link-local or other
+    non-public addresses are rejected so callers cannot reach internal services.
+    """
+    if not isinstance(url, str):
+        return "'webhook_url' must be a string."
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return "'webhook_url' must be an http(s) URL."
+
+    host = parsed.hostname.lower()
+    if allowed_hosts:
+        for allowed in allowed_hosts:
+            allowed = allowed.strip().lower()
+            if host == allowed.lstrip(".") or (allowed.startswith(".") and host.endswith(allowed)):
+                return None
+        return f"Webhook host '{host}' is not in the allowed hosts."
+
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or None)}
+    except (socket.gaierror, UnicodeError):
+        return f"Webhook host '{host}' could not be resolved."
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global:
+            return f"Webhook host '{host}' resolves to a non-public address."
+    return None
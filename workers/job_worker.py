@@ -0,0 +1,130 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import requests
+from decouple import config
+from agent_graph.graph import create_graph, compile_workflow, run_workflow
+from db.job_store import JobStore, SUCCEEDED
+from utils.deadline import DeadlineExceeded
+from utils.webhook_guard import webhook_url_error
+
+JOB_TIMEOUT_SECONDS = float(config("JOB_TIMEOUT_SECONDS", 600))
+JOB_POLL_INTERVAL_SECONDS = float(config("JOB_POLL_INTERVAL_SECONDS", 1))
+WEBHOOK_TIMEOUT_SECONDS = float(config("WEBHOOK_TIMEOUT_SECONDS", 10))
+# Comma-separated hosts (".example.com" for subdomains); empty means any public address
+WEBHOOK_ALLOWED_HOSTS = [host for host in config("JOB_WEBHOOK_ALLOWED_HOSTS", default="").split(",") if host.strip()]
+ITERATIONS = int(config("ITERATIONS", 40))
+
+logger = logging.getLogger("workers.job_worker")
+
+
+class JobWorker(threading.Thread):
+    """
+    Claims queued jobs from the JobStore and runs them through the compiled workflow.
+    """
+    def __init__(self, store: JobStore, workflow, stop_event: threading.Event, name=None):
+        super().__init__(name=name, daemon=True)
+        self.store = store
+        self.workflow = workflow
+        self.stop_event = stop_event
+        # Unique across threads, processes and restarts so lease ownership checks are reliable
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{name or 'job-worker'}-{uuid.uuid4().hex[:8]}"
+        # The lease outlives the job deadline so a healthy worker never loses its job
+        self.lease_seconds = JOB_TIMEOUT_SECONDS + 60
+
+    def run(self):
+        logger.info(f"Job worker {self.worker_id} started")
+        while not self.stop_event.is_set():
+            try:
+                self.store.fail_exhausted()
+                job = self.store.claim(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Job worker {self.worker_id} failed to claim a job: {e}")
+                job = None
+            if job is None:
+                self.stop_event.wait(JOB_POLL_INTERVAL_SECONDS)
+                continue
+            self.process(job)
+
+    def process(self, job):
+        job_id = job["_id"]
+        logger.info(f"Job worker {self.worker_id} running job {job_id} (attempt {job['attempts']})")
+        try:
+            # ✅ The job id doubles as the thread id, so /history works for jobs too
+            result = run_workflow(
+                self.workflow,
+                job["user_query"],
+                job_id,
+                time.time() + JOB_TIMEOUT_SECONDS,
+                ITERATIONS
+            )
+            finished = self.store.complete(job_id, self.worker_id, job["attempts"], result)
+        except DeadlineExceeded as e:
+            finished = self.store.fail(job_id, self.worker_id, job["attempts"], str(e), stage=e.stage)
+        except Exception as e:
+            logger.error(f"Error running job {job_id}: {e}")
+            finished = self.store.fail(job_id, self.worker_id, job["attempts"], str(e))
+
+        if finished is None:
+            logger.warning(f"Job {job_id} was taken over by another worker; dropping result")
+            return
+        if finished.get("webhook_url"):
+            self.send_webhook(finished)
+
+    def send_webhook(self, job):
+        payload = {
+            "job_id": job["_id"],
+            "status": job["status"],
+            "result": job.get("result") if job["status"] == SUCCEEDED else None,
+            "error": job.get("error"),
+            "stage": job.get("stage"),
+        }
+        # Re-checked at send time since DNS may have changed since submission
+        webhook_error = webhook_url_error(job["webhook_url"], WEBHOOK_ALLOWED_HOSTS)
+        if webhook_error:
+            logger.error(f"Webhook for job {job['_id']} refused: {webhook_error}")
+            self.store.record_webhook(job["_id"], None)
+            return
+        try:
+            response = requests.post(
+                job["webhook_url"], json=payload, timeout=WEBHOOK_TIMEOUT_SECONDS, allow_redirects=False
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            logger.error(f"Webhook for job {job['_id']} failed: {e}")
+            status = None
+        self.store.record_webhook(job["_id"], status)
+
+
+def start_workers(workflow, count, store=None):
+    """
+    Starts `count` in-process workers. Returns the event that stops them.
+    """
+    store = store or JobStore()
+    stop_event = threading.Event()
+    for i in range(count):
+        JobWorker(store, workflow, stop_event, name=f"job-worker-{i}").start()
+    return stop_event
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    count = int(config("JOB_WORKERS", 2))
+    workflow = compile_workflow(create_graph(temperature=int(config("LLM_TEMPERATURE", 0))))
+    stop_event = start_workers(workflow, max(count, 1))
+    logger.info(f"Started {max(count, 1)} job workers")
+    try:
+        while not stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+if __name__ == "__main__":
+    main()